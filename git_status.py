@@ -0,0 +1,176 @@
+# git_status.py — декорации состояния git для проводника
+import os, subprocess
+
+from PyQt5.QtCore import Qt, QObject, QThread, QTimer, QFileSystemWatcher, QSize, pyqtSignal
+from PyQt5.QtGui import QColor
+from PyQt5.QtWidgets import QFileSystemModel, QStyledItemDelegate
+
+# Чем выше приоритет, тем "важнее" состояние при агрегации по папкам
+STATE_PRIORITY = {'untracked': 1, 'renamed': 2, 'added': 3, 'deleted': 4, 'modified': 5, 'conflict': 6}
+STATE_COLORS = {'untracked': '#73C991', 'renamed': '#73C991', 'added': '#81B88B', 'deleted': '#C74E39', 'modified': '#E2C08D', 'conflict': '#E4676B'}
+STATE_BADGES = {'untracked': 'U', 'renamed': 'R', 'added': 'A', 'deleted': 'D', 'modified': 'M', 'conflict': 'C'}
+GIT_BADGE_ROLE = Qt.UserRole + 1  # бейдж рисует GitBadgeDelegate, DisplayRole остаётся именем файла
+
+def norm_path(path): return os.path.normcase(os.path.abspath(path))
+
+def _state_from_xy(kind, xy):
+    if kind == 'u': return 'conflict'
+    if kind == '2': return 'renamed'
+    if 'D' in xy: return 'deleted'
+    if 'A' in xy: return 'added'
+    return 'modified'
+
+def parse_porcelain_v2(output, root):
+    """Разбирает вывод `git status --porcelain=v2 -z` в словарь {абсолютный путь: состояние}."""
+    states = {}; entries = output.split('\0'); i = 0
+    while i < len(entries):
+        entry = entries[i]; i += 1
+        if not entry or entry.startswith('#'): continue
+        kind = entry[0]
+        if kind == '?': path, state = entry[2:], 'untracked'
+        elif kind in '12u':
+            # число полей до пути: 1 -> 8, 2 -> 9 (+ исходный путь отдельной записью), u -> 10
+            fields = entry.split(' ', {'1': 8, '2': 9, 'u': 10}[kind])
+            path, state = fields[-1], _state_from_xy(kind, fields[1])
+            if kind == '2': i += 1
+        else: continue
+        states[norm_path(os.path.join(root, path.rstrip('/')))] = state
+    return states
+
+def aggregate_dirs(file_states, root):
+    """Поднимает состояния файлов вверх до корня репозитория: папка получает самое приоритетное состояние потомков."""
+    dir_states = {}; root = norm_path(root)
+    for path, state in file_states.items():
+        parent = os.path.dirname(path)
+        while len(parent) >= len(root) and parent.startswith(root):
+            current = dir_states.get(parent)
+            if current and STATE_PRIORITY[current] >= STATE_PRIORITY[state]: break
+            dir_states[parent] = state
+            if parent == root: break
+            parent = os.path.dirname(parent)
+    return dir_states
+
+def find_repo_root(path):
+    try:
+        result = subprocess.run(['git', 'rev-parse', '--show-toplevel'], cwd=path, capture_output=True, text=True, timeout=10)
+        return result.stdout.strip() if result.returncode == 0 else None
+    except (OSError, subprocess.SubprocessError): return None
+
+class GitStatusWorker(QThread):
+    """Один пакетный вызов git status в фоне. Если заданы paths — обновляет только их поверх снимка file_states."""
+    status_ready = pyqtSignal(object, object, object)
+    def __init__(self, root, file_states, paths=None, parent=None):
+        super().__init__(parent); self.root = root; self.file_states = file_states; self.paths = paths
+    def run(self):
+        cmd = ['git', '--no-optional-locks', 'status', '--porcelain=v2', '-z']
+        if self.paths: cmd += ['--'] + [os.path.relpath(p, self.root) for p in self.paths]
+        try: result = subprocess.run(cmd, cwd=self.root, capture_output=True, timeout=60)
+        except (OSError, subprocess.SubprocessError) as e: print(f"git status не выполнен: {e}"); return
+        if result.returncode != 0:
+            print(f"git status завершился с ошибкой: {result.stderr.decode(errors='ignore').strip()}"); return
+        fresh = parse_porcelain_v2(result.stdout.decode('utf-8', errors='surrogateescape'), self.root)
+        if self.paths:
+            # инкрементально: выкидываем старые записи по обновлённым путям и кладём свежие
+            prefixes = [norm_path(p) for p in self.paths]
+            file_states = {p: s for p, s in self.file_states.items() if not any(p == x or p.startswith(x + os.sep) for x in prefixes)}
+            file_states.update(fresh)
+        else: file_states = fresh
+        # неотслеживаемые папки git отдаёт одной записью — их содержимое декорируем по ближайшему такому предку
+        untracked_dirs = frozenset(p for p, s in file_states.items() if s == 'untracked' and os.path.isdir(p))
+        self.status_ready.emit(file_states, aggregate_dirs(file_states, self.root), untracked_dirs)
+
+class GitStatusCache(QObject):
+    """Кэш путь -> состояние git. Обновления дебаунсятся и выполняются в GitStatusWorker, UI только читает словари."""
+    changed = pyqtSignal()
+    def __init__(self, path, delay_ms=300, parent=None):
+        super().__init__(parent); self.file_states = {}; self.dir_states = {}; self.untracked_dirs = frozenset(); self.lookup = {}
+        self.root = find_repo_root(path); self.worker = None
+        self.pending_paths = set(); self.full_refresh = False
+        self.timer = QTimer(self); self.timer.setSingleShot(True); self.timer.setInterval(delay_ms)
+        self.timer.timeout.connect(self._start_worker)
+        self.watcher = QFileSystemWatcher(self); self.watcher.fileChanged.connect(self._on_file_changed)
+        self.git_files = set()
+        if self.root:
+            self.root = norm_path(self.root); git_dir = os.path.join(self.root, '.git')
+            self.git_files = {os.path.join(git_dir, 'index'), os.path.join(git_dir, 'HEAD')}
+            self._watch(self.git_files); self.refresh()
+
+    def _watch(self, files):
+        # редакторы и git часто пишут файлы через rename, после чего наблюдение слетает — переподписываемся
+        files = [f for f in files if os.path.exists(f) and f not in self.watcher.files()]
+        if files: self.watcher.addPaths(files)
+    def _on_file_changed(self, path):
+        self._watch([path])
+        # index и HEAD меняются при add/commit/checkout — полное обновление; открытый файл — только он сам
+        self.refresh() if path in self.git_files else self.refresh([path])
+    def watch_file(self, path):
+        """Следить за правками файла вне IDE (форматтер в терминале, другой редактор)."""
+        if self.root and self.in_repo(norm_path(path)): self._watch([path])
+    def unwatch_file(self, path):
+        if path in self.watcher.files() and path not in self.git_files: self.watcher.removePath(path)
+
+    def refresh(self, paths=None):
+        """Запланировать обновление. Без paths — полное, иначе только для указанных путей."""
+        if not self.root: return
+        if paths is None: self.full_refresh = True
+        else: self.pending_paths.update(p for p in map(norm_path, filter(None, paths)) if self.in_repo(p))
+        if self.full_refresh or self.pending_paths: self.timer.start()
+    def in_repo(self, path): return path == self.root or path.startswith(self.root + os.sep)
+    def _start_worker(self):
+        if self.worker is not None: return  # перезапустимся по окончании текущего
+        paths = None if self.full_refresh else sorted(self.pending_paths)
+        self.full_refresh = False; self.pending_paths = set()
+        self.worker = GitStatusWorker(self.root, dict(self.file_states), paths, self)
+        self.worker.status_ready.connect(self._on_status_ready); self.worker.finished.connect(self._on_worker_finished)
+        self.worker.finished.connect(self.worker.deleteLater)
+        self.worker.start()
+    def _on_status_ready(self, file_states, dir_states, untracked_dirs):
+        self.file_states = file_states; self.dir_states = dir_states; self.untracked_dirs = untracked_dirs; self.lookup = {}
+        self.changed.emit()
+    def _on_worker_finished(self):
+        self.worker = None
+        if self.full_refresh or self.pending_paths: self.timer.start()
+
+    def state(self, path, is_dir=False):
+        """Состояние по пути в виде, который отдаёт модель. Результат запоминается до следующего git status,
+        так что повторная отрисовка элемента стоит одного поиска в словаре."""
+        key = (path, is_dir)
+        if key not in self.lookup: self.lookup[key] = self._resolve(norm_path(path), is_dir)
+        return self.lookup[key]
+    def _resolve(self, path, is_dir):
+        # неотслеживаемая папка приходит от git одной записью, поэтому для папок смотрим и file_states
+        state = (self.dir_states.get(path) or self.file_states.get(path)) if is_dir else self.file_states.get(path)
+        if state is None and self.untracked_dirs and self.in_repo(path):
+            parent = os.path.dirname(path)
+            while parent != path and self.in_repo(parent):
+                if parent in self.untracked_dirs: return 'untracked'
+                path, parent = parent, os.path.dirname(parent)
+        return state
+    def shutdown(self):
+        self.timer.stop()
+        if self.worker is not None: self.worker.wait()
+
+class GitFileSystemModel(QFileSystemModel):
+    """QFileSystemModel, который красит элементы по кэшу GitStatusCache и отдаёт бейдж через GIT_BADGE_ROLE."""
+    def __init__(self, parent=None): super().__init__(parent); self.git_status = None
+    def set_git_status(self, git_status): self.git_status = git_status
+    def data(self, index, role=Qt.DisplayRole):
+        value = super().data(index, role)
+        if self.git_status is None or index.column() != 0 or role not in (GIT_BADGE_ROLE, Qt.ForegroundRole, Qt.ToolTipRole): return value
+        state = self.git_status.state(self.filePath(index), self.isDir(index))
+        if not state: return value
+        if role == Qt.ForegroundRole: return QColor(STATE_COLORS[state])
+        if role == Qt.ToolTipRole: return f"{self.filePath(index)}\ngit: {state}"
+        return None if self.isDir(index) else STATE_BADGES.get(state)
+
+class GitBadgeDelegate(QStyledItemDelegate):
+    """Рисует бейдж состояния git справа от имени файла, не трогая само имя."""
+    def paint(self, painter, option, index):
+        super().paint(painter, option, index)
+        if not (badge := index.data(GIT_BADGE_ROLE)): return
+        painter.save(); painter.setPen(index.data(Qt.ForegroundRole) or option.palette.text().color())
+        painter.drawText(option.rect.adjusted(0, 0, -6, 0), Qt.AlignRight | Qt.AlignVCenter, badge); painter.restore()
+    def sizeHint(self, option, index):
+        size = super().sizeHint(option, index)
+        if badge := index.data(GIT_BADGE_ROLE): size += QSize(option.fontMetrics.horizontalAdvance(f"  {badge}") + 6, 0)
+        return size
@@ -1,15 +1,15 @@
-import sys, os, re, types, json, shutil, urllib.request
+import sys, os, re, types, json, shutil, urllib.request, bisect
 from collections import namedtuple
 
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QAction, QFileDialog, QMessageBox, QToolBar,
-    QWidget, QTabWidget, QTreeView, QFileSystemModel, QDockWidget,
+    QWidget, QTabWidget, QTreeView, QDockWidget,
     QTableWidget, QTableWidgetItem, QHeaderView, QPlainTextEdit, QActionGroup,
     QTextEdit, QHBoxLayout, QLineEdit, QPushButton, QCheckBox, QVBoxLayout,
     QDialog, QListWidget, QListWidgetItem, QLabel, QFileIconProvider, QMenu, QInputDialog
 )
 from PyQt5.QtGui import QFont, QColor, QSyntaxHighlighter, QTextCharFormat, QPainter, QTextDocument, QTextCursor, QIcon, QPixmap
-from PyQt5.QtCore import Qt, QDir, QSettings, QRect, QSize, QProcess, QFileInfo
+from PyQt5.QtCore import Qt, QDir, QSettings, QRect, QSize, QProcess, QFileInfo, pyqtSignal
 
 try:
     from qtconsole.rich_jupyter_widget import RichJupyterWidget
@@ -18,6 +18,9 @@ except ImportError:
     print("Ошибка: qtconsole не найден. Установите его: pip install -r requirements.txt")
     sys.exit(1)
 
+from git_status import GitStatusCache, GitFileSystemModel, GitBadgeDelegate
+import parallel_tokenizer
+
 class LanguageIconProvider(QFileIconProvider):
     def __init__(self):
         super().__init__()
@@ -48,17 +51,89 @@ class BaseHighlighter(QSyntaxHighlighter):
     def __init__(self, parent, rules, scheme):
         super().__init__(parent); self.rules = []; self.scheme = {key: QColor(value) for key, value in scheme.items()}
         for rule in rules:
-            fmt = QTextCharFormat()
-            if color := self.scheme.get(rule.format_key):
-                fmt.setForeground(color)
-                if rule.format_key in ["keyword", "self"]: fmt.setFontWeight(QFont.Bold)
-                if rule.format_key == "comment": fmt.setFontItalic(True)
             pattern = re.compile(rule.pattern) if isinstance(rule.pattern, str) else rule.pattern
-            self.rules.append((pattern, fmt))
+            self.rules.append((pattern, self.make_format(rule.format_key)))
+    def make_format(self, format_key):
+        fmt = QTextCharFormat()
+        if color := self.scheme.get(format_key):
+            fmt.setForeground(color)
+            if format_key in ["keyword", "self"]: fmt.setFontWeight(QFont.Bold)
+            if format_key == "comment": fmt.setFontItalic(True)
+        return fmt
     def highlightBlock(self, text):
         for pattern, fmt in self.rules:
             for match in pattern.finditer(text): self.setFormat(match.start(), match.end() - match.start(), fmt)
 
+class ParallelHighlighter(BaseHighlighter):
+    """Режим для больших документов: строки режутся на диапазоны и токенизируются в пуле процессов,
+    highlightBlock только применяет готовые отрезки. Диапазон, в котором была правка или сбой, подсвечивается по-старому.
+    Готовые отрезки применяются лениво: редактор вызывает ensure_highlighted для видимых блоков."""
+    range_ready = pyqtSignal(object, object)
+    runs_ready = pyqtSignal()
+    def __init__(self, parent, rules, scheme):
+        # документ подключаем после своего обработчика contentsChange, чтобы инвалидация шла раньше перерисовки блока
+        super().__init__(None, rules, scheme); self.source_rules = rules; self.formats = [fmt for _, fmt in self.rules]
+        self.ranges = []; self.range_starts = []; self.futures = []
+        self.range_ready.connect(self._on_range_ready)
+        parent.contentsChange.connect(self._on_contents_change); self.setDocument(parent)
+        self.block_count = parent.blockCount(); self.revision = parent.revision()
+        lines = parent.toPlainText().split('\n')
+        if len(lines) != self.block_count: return  # на всякий случай: без точного соответствия строк работаем однопоточно
+        try: submitted = parallel_tokenizer.submit_ranges(lines, [pattern for pattern, _ in self.rules])
+        except Exception as e: print(f"Параллельная подсветка недоступна, подсвечиваем однопоточно: {e}"); return
+        ends = [start for start, _ in submitted[1:]] + [len(lines)]
+        for (start, future), end in zip(submitted, ends):
+            # [первая строка, None — считается / False — однопоточно / (offsets, runs), флаги «строка раскрашена»]
+            rng = [start, None, bytearray(end - start)]
+            self.ranges.append(rng); self.futures.append(future)
+            future.add_done_callback(lambda f, rng=rng: self._on_future_done(f, rng))
+        self.range_starts = [rng[0] for rng in self.ranges]
+    def _on_future_done(self, future, rng):
+        # поток пула: забираем результат из разделяемой памяти здесь, в GUI-поток отдаём готовые массивы
+        try: runs = parallel_tokenizer.read_runs(future.result())
+        except Exception: runs = False
+        try: self.range_ready.emit(rng, runs)
+        except RuntimeError: pass  # подсветчик уже удалён
+    def _on_range_ready(self, rng, runs):
+        # при сбое runs is False — строки диапазона уйдут в однопоточный highlightBlock
+        if rng[1] is not None or self.document() is None: return
+        rng[1] = runs; self.runs_ready.emit()
+    def _on_contents_change(self, position, removed, added):
+        document = self.document()
+        if document is None or not self.ranges or document.revision() == self.revision: return  # только форматирование, текст не менялся
+        self.revision = document.revision(); delta = document.blockCount() - self.block_count; self.block_count = document.blockCount()
+        first = document.findBlock(position).blockNumber(); last_old = document.findBlock(position + added).blockNumber() - delta
+        # все затронутые диапазоны сливаются в один инвалидированный, следующие сдвигаются на delta строк
+        i = max(0, bisect.bisect_right(self.range_starts, first) - 1); j = max(i, bisect.bisect_right(self.range_starts, last_old) - 1)
+        for rng in self.ranges[i:j + 1]: rng[1] = False
+        for rng in self.ranges[j + 1:]: rng[0] += delta
+        start = self.ranges[i][0]; end = self.ranges[j + 1][0] if j + 1 < len(self.ranges) else self.block_count
+        self.ranges[i:j + 1] = [[start, False, bytearray(end - start)]]; self.range_starts = [rng[0] for rng in self.ranges]
+    def _range_for(self, line): return self.ranges[max(0, bisect.bisect_right(self.range_starts, line) - 1)]
+    def cancel(self):
+        for future in self.futures: future.cancel()
+    def set_scheme(self, scheme):
+        """Смена темы: отрезки хранят номера форматов, поэтому достаточно пересобрать форматы и перекрасить видимое."""
+        self.scheme = {key: QColor(value) for key, value in scheme.items()}
+        self.rules = [(pattern, self.make_format(rule.format_key)) for (pattern, _), rule in zip(self.rules, self.source_rules)]
+        self.formats = [fmt for _, fmt in self.rules]
+        if not self.ranges: return self.rehighlight()
+        for rng in self.ranges: rng[2] = bytearray(len(rng[2]))
+        self.runs_ready.emit()
+    def ensure_highlighted(self, block):
+        """Раскрасить блок, если он пропущен, пока диапазон считался, или устарел после смены темы."""
+        if not self.ranges: return
+        line = block.blockNumber(); rng = self._range_for(line); k = line - rng[0]
+        if rng[1] is not None and k < len(rng[2]) and not rng[2][k]: self.rehighlightBlock(block)
+    def highlightBlock(self, text):
+        if not self.ranges: return super().highlightBlock(text)
+        line = self.currentBlock().blockNumber(); rng = self._range_for(line); k = line - rng[0]
+        if rng[1] is None: return  # результат ещё не пришёл — блок раскрасится в ensure_highlighted
+        if k < len(rng[2]): rng[2][k] = 1
+        if rng[1] is False or k + 1 >= len(rng[1][0]): return super().highlightBlock(text)
+        offsets, runs = rng[1]
+        for n in range(offsets[k] * 3, offsets[k + 1] * 3, 3): self.setFormat(runs[n], runs[n + 1], self.formats[runs[n + 2]])
+
 class LanguageManager:
     def __init__(self):
         self.languages = {}; self.plugin_dir = 'plugins'
@@ -91,7 +166,8 @@ class EditorWidget(QPlainTextEdit):
         self.file_path = None; self.is_modified = False; self.highlighter = None
         self.line_number_area = LineNumberArea(self)
         self.blockCountChanged.connect(self.updateLineNumberAreaWidth)
-        self.updateRequest.connect(self.updateLineNumberArea)
+        self.updateRequest.connect(self.updateLineNumberArea); self.updateRequest.connect(self.highlight_visible_blocks)
+        self.verticalScrollBar().valueChanged.connect(self.highlight_visible_blocks)  # на большой прокрутке updateRequest не приходит
         self.cursorPositionChanged.connect(self.highlightCurrentLine)
         self.textChanged.connect(self.on_text_changed)
         self.setFont(QFont('Consolas', 12)); self.updateLineNumberAreaWidth(0)
@@ -109,7 +185,22 @@ class EditorWidget(QPlainTextEdit):
         super().keyPressEvent(event)
     def on_text_changed(self):
         if not self.is_modified: self.is_modified = True; self.main_window.update_tab_title(self)
-    def set_highlighter(self, highlighter_class, rules, scheme): self.highlighter = highlighter_class(self.document(), rules, scheme)
+    def set_highlighter(self, highlighter_class, rules, scheme):
+        # плагины импортируют main как отдельный модуль, поэтому сравниваем по имени класса
+        parallel = (highlighter_class.__name__ == BaseHighlighter.__name__ and self.main_window.parallel_highlighting
+                    and parallel_tokenizer.parallel_available() and self.blockCount() >= parallel_tokenizer.PARALLEL_THRESHOLD)
+        if parallel and isinstance(self.highlighter, ParallelHighlighter) and self.highlighter.source_rules is rules:
+            return self.highlighter.set_scheme(scheme)  # правила те же — токенизация не нужна, меняем только форматы
+        if self.highlighter:
+            if isinstance(self.highlighter, ParallelHighlighter): self.highlighter.cancel()
+            self.highlighter.setDocument(None)  # иначе старый подсветчик остаётся висеть на документе
+        self.highlighter = (ParallelHighlighter if parallel else highlighter_class)(self.document(), rules, scheme)
+        if parallel: self.highlighter.runs_ready.connect(self.highlight_visible_blocks)
+    def highlight_visible_blocks(self, *_):
+        if not isinstance(self.highlighter, ParallelHighlighter): return
+        block = self.firstVisibleBlock(); top = self.blockBoundingGeometry(block).translated(self.contentOffset()).top()
+        while block.isValid() and top <= self.viewport().height():
+            self.highlighter.ensure_highlighted(block); top += self.blockBoundingRect(block).height(); block = block.next()
     def lineNumberAreaWidth(self): return 10 + self.fontMetrics().horizontalAdvance('9') * len(str(max(1, self.blockCount())))
     def updateLineNumberAreaWidth(self, _=None): self.setViewportMargins(self.lineNumberAreaWidth(), 0, 0, 0)
     def updateLineNumberArea(self, rect, dy):
@@ -245,6 +336,7 @@ class MainWindow(QMainWindow):
     def __init__(self):
         super().__init__(); self.settings = QSettings('ProgerIDE', 'Editor')
         self.current_theme_name = self.settings.value('theme', 'vscode_dark')
+        self.parallel_highlighting = self.settings.value('parallel_highlighting', True, type=bool)
         self.language_manager = LanguageManager()
         self.initUI(); self.start_kernel(); self.set_theme(self.current_theme_name)
 
@@ -279,10 +371,16 @@ class MainWindow(QMainWindow):
         return find_widget
 
     def setup_docks(self):
-        self.fs_model = QFileSystemModel(); self.fs_model.setRootPath(QDir.currentPath())
+        self.fs_model = GitFileSystemModel(); self.fs_model.setRootPath(QDir.currentPath())
         icon_provider = LanguageIconProvider(); self.fs_model.setIconProvider(icon_provider)
+        self.git_status = GitStatusCache(QDir.currentPath(), parent=self); self.fs_model.set_git_status(self.git_status)
+        # обновляем только затронутую папку; полное обновление — по событиям .git/index и .git/HEAD
+        for signal in (self.fs_model.rowsInserted, self.fs_model.rowsRemoved): signal.connect(lambda parent, *_: self.git_status.refresh([self.fs_model.filePath(parent)]))
+        # правки рабочего дерева вне IDE: по возвращении в окно — полное обновление (с задержкой и дебаунсом)
+        QApplication.instance().applicationStateChanged.connect(lambda state: state == Qt.ApplicationActive and self.git_status.refresh())
         self.tree = QTreeView(); self.tree.setModel(self.fs_model); self.tree.setRootIndex(self.fs_model.index(QDir.currentPath()))
-        self.tree.doubleClicked.connect(self.open_from_tree); self.tree.setHeaderHidden(True)
+        self.tree.doubleClicked.connect(self.open_from_tree); self.tree.setHeaderHidden(True); self.tree.setItemDelegate(GitBadgeDelegate(self.tree))
+        self.git_status.changed.connect(self.tree.viewport().update)
         for i in range(1, self.fs_model.columnCount()): self.tree.hideColumn(i)
         self.tree.setContextMenuPolicy(Qt.CustomContextMenu)
         self.tree.customContextMenuRequested.connect(self.show_tree_context_menu)
@@ -322,7 +420,7 @@ class MainWindow(QMainWindow):
         new_name, ok = QInputDialog.getText(self, "Переименовать", "Новое имя:", text=old_name)
         if ok and new_name and new_name != old_name:
             new_path = os.path.join(os.path.dirname(path), new_name)
-            try: os.rename(path, new_path)
+            try: os.rename(path, new_path); self.git_status.refresh([path, new_path])
             except Exception as e: QMessageBox.critical(self, "Ошибка", f"Не удалось переименовать:\n{e}")
 
     def delete_item(self, path):
@@ -351,11 +449,15 @@ class MainWindow(QMainWindow):
             action = QAction(theme_name, self, checkable=True, triggered=lambda c, n=theme_name: self.set_theme(n))
             if theme_name == self.current_theme_name: action.setChecked(True)
             theme_group.addAction(action); theme_menu.addAction(action)
+        parallel_action = QAction("Параллельная подсветка больших файлов", self, checkable=True, triggered=self.toggle_parallel_highlighting)
+        parallel_action.setChecked(self.parallel_highlighting); view_menu.addAction(parallel_action)
         tools_menu = menu_bar.addMenu('&Инструменты'); plugin_action = QAction("Менеджер плагинов", self, triggered=self.open_plugin_manager); tools_menu.addAction(plugin_action)
 
     def open_plugin_manager(self): 
         dialog = PluginManagerDialog(self); 
         dialog.exec_()
+    def toggle_parallel_highlighting(self, checked):
+        self.parallel_highlighting = checked; self.set_theme(self.current_theme_name)
     def toggle_find_widget(self): 
         self.find_widget.setVisible(not self.find_widget.isVisible());
     def find_text(self):
@@ -409,6 +511,7 @@ class MainWindow(QMainWindow):
             editor = EditorWidget(self); editor.setPlainText(content); editor.file_path = path
             self.apply_highlighter_to_editor(editor); idx = self.tabs.addTab(editor, os.path.basename(path))
             self.tabs.setCurrentIndex(idx); self.tabs.setTabToolTip(idx, path); self.set_theme(self.current_theme_name)
+            self.git_status.watch_file(path)
         except Exception as e: QMessageBox.critical(self, 'Ошибка', f'Не удалось открыть файл:\n{e}')
     def apply_highlighter_to_editor(self, editor):
         if not editor.file_path: return
@@ -423,7 +526,7 @@ class MainWindow(QMainWindow):
         if not editor.file_path: return self.save_file_as(editor)
         try:
             with open(editor.file_path, 'w', encoding='utf-8') as f: f.write(editor.toPlainText())
-            editor.is_modified = False; self.update_tab_title(editor); return True
+            editor.is_modified = False; self.update_tab_title(editor); self.git_status.refresh([editor.file_path]); self.git_status.watch_file(editor.file_path); return True
         except Exception as e: QMessageBox.critical(self, 'Ошибка', f'Не удалось сохранить: {e}'); return False
     def save_file_as(self, editor):
         path, _ = QFileDialog.getSaveFileName(self, 'Сохранить как...');
@@ -445,6 +548,9 @@ class MainWindow(QMainWindow):
         if not hasattr(self, 'terminal_process') or self.terminal_process.state() == QProcess.NotRunning:
             self.terminal_process = QProcess(self)
             self.terminal_process.readyReadStandardOutput.connect(lambda: self.terminal_output.appendPlainText(self.terminal_process.readAllStandardOutput().data().decode(errors='ignore')))
+            # скрипт или форматтер мог поменять файлы — обновление дебаунсится, пока идёт вывод
+            self.terminal_process.readyReadStandardOutput.connect(lambda: self.git_status.refresh())
+            self.terminal_process.readyReadStandardError.connect(lambda: self.git_status.refresh())
             self.terminal_process.readyReadStandardError.connect(lambda: self.terminal_output.appendPlainText(self.terminal_process.readAllStandardError().data().decode(errors='ignore')))
             shell = 'powershell.exe' if sys.platform == 'win32' else 'bash'
             self.terminal_process.start(shell)
@@ -461,11 +567,14 @@ class MainWindow(QMainWindow):
             reply = QMessageBox.question(self, "Несохраненные изменения", f"В файле '{self.tabs.tabText(index)}' есть несохраненные изменения. Сохранить?", QMessageBox.Save | QMessageBox.Discard | QMessageBox.Cancel)
             if reply == QMessageBox.Save and not self.save_file(editor): return
             elif reply == QMessageBox.Cancel: return
+        if editor.file_path: self.git_status.unwatch_file(editor.file_path)
         self.tabs.removeTab(index)
     def closeEvent(self, event):
-        self.settings.setValue('theme', self.current_theme_name)
+        self.settings.setValue('theme', self.current_theme_name); self.settings.setValue('parallel_highlighting', self.parallel_highlighting)
         if hasattr(self, 'kernel_manager'): self.kernel_manager.shutdown_kernel()
         if hasattr(self, 'terminal_process'): self.terminal_process.kill()
+        if hasattr(self, 'git_status'): self.git_status.shutdown()
+        parallel_tokenizer.shutdown_pool()
         super().closeEvent(event)
 
 if __name__ == '__main__':
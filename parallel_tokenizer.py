@@ -0,0 +1,114 @@
+# parallel_tokenizer.py — токенизация больших документов в пуле процессов
+# Модуль намеренно не импортирует Qt: его функции выполняются в дочерних процессах.
+import os, re, sys, time, multiprocessing
+from array import array
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory, resource_tracker
+
+PARALLEL_THRESHOLD = 50000  # с какого числа строк подсветка уходит в пул процессов
+RANGE_SIZE = 20000          # строк в одном задании
+
+_pool = None
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        # spawn, а не fork: форкать процесс с живым Qt небезопасно
+        _pool = ProcessPoolExecutor(max_workers=max(1, (os.cpu_count() or 2) - 1), mp_context=multiprocessing.get_context('spawn'))
+    return _pool
+
+@contextmanager
+def _light_main():
+    """spawn выполняет в каждом новом процессе модуль __main__ заново, а это main.py с PyQt5 и qtconsole.
+    Процессы пула запускаются внутри submit, поэтому на это время подставляем вместо __main__ этот модуль."""
+    main_module = sys.modules['__main__']; sys.modules['__main__'] = sys.modules[__name__]
+    try: yield
+    finally: sys.modules['__main__'] = main_module
+
+def parallel_available(): return (os.cpu_count() or 1) > 1
+
+def shutdown_pool():
+    global _pool
+    if _pool is not None: _pool.shutdown(wait=False, cancel_futures=True); _pool = None
+
+def pattern_specs(patterns):
+    """Скомпилированные re передаём в процессы как (исходник, флаги) — так дешевле и надёжнее, чем pickle."""
+    return [(p.pattern, p.flags) if hasattr(p, 'finditer') else (p, 0) for p in patterns]
+
+def tokenize_lines(lines, patterns):
+    """Те же правила, что в BaseHighlighter.highlightBlock, но для набора строк.
+    Возвращает offsets (len(lines) + 1) и плоский массив runs из троек (start, length, format_id);
+    отрезки строки k — runs[offsets[k] * 3:offsets[k + 1] * 3], в порядке применения правил."""
+    offsets = array('i', [0]); runs = array('i')
+    for text in lines:
+        for fmt_id, pattern in enumerate(patterns):
+            for m in pattern.finditer(text):
+                if m.end() > m.start(): runs.extend((m.start(), m.end() - m.start(), fmt_id))
+        offsets.append(len(runs) // 3)
+    return offsets, runs
+
+def _tokenize_range(lines, specs):
+    offsets, runs = tokenize_lines(lines, [re.compile(src, flags) for src, flags in specs])
+    if os.name == 'nt':
+        # на Windows именованная память исчезает вместе с последним дескриптором — отдаём байты
+        return ('bytes', offsets.tobytes(), runs.tobytes())
+    size = (len(offsets) + len(runs)) * offsets.itemsize
+    shm = shared_memory.SharedMemory(create=True, size=size)
+    # освобождать память будет родитель (read_runs), трекер дочернего процесса её не трогает
+    resource_tracker.unregister(shm._name, 'shared_memory')
+    split = len(offsets) * offsets.itemsize
+    shm.buf[:split] = offsets.tobytes(); shm.buf[split:size] = runs.tobytes()
+    name = shm.name; shm.close()
+    return ('shm', name, len(offsets), len(runs))
+
+def read_runs(result):
+    """Забирает результат задания (offsets, runs) и освобождает разделяемую память."""
+    kind, *payload = result; offsets = array('i'); runs = array('i')
+    if kind == 'bytes':
+        offsets.frombytes(payload[0]); runs.frombytes(payload[1]); return offsets, runs
+    name, n_offsets, n_runs = payload; shm = shared_memory.SharedMemory(name=name)
+    try:
+        split = n_offsets * offsets.itemsize
+        offsets.frombytes(shm.buf[:split]); runs.frombytes(shm.buf[split:split + n_runs * runs.itemsize])
+    finally: shm.close(); shm.unlink()
+    return offsets, runs
+
+def submit_ranges(lines, patterns, range_size=RANGE_SIZE):
+    """Режет строки на диапазоны и отправляет их в пул. Возвращает [(первая строка, future), ...]."""
+    specs = pattern_specs(patterns)
+    for attempt in range(2):
+        pool = get_pool()
+        try:
+            with _light_main():
+                return [(start, pool.submit(_tokenize_range, lines[start:start + range_size], specs)) for start in range(0, len(lines), range_size)]
+        except BrokenProcessPool:
+            # упавший процесс ломает пул навсегда — выбрасываем его и пробуем ещё раз на новом
+            shutdown_pool()
+            if attempt: raise
+
+def parallel_tokenize(lines, patterns, range_size=RANGE_SIZE):
+    """Синхронный вариант: [(первая строка, offsets, runs), ...] по всем диапазонам."""
+    return [(start, *read_runs(future.result())) for start, future in submit_ranges(lines, patterns, range_size)]
+
+def benchmark(lines, patterns, range_size=RANGE_SIZE):
+    t0 = time.perf_counter(); tokenize_lines(lines, patterns); serial = time.perf_counter() - t0
+    parallel_tokenize(lines[:range_size], patterns, range_size)  # прогрев: запуск процессов пула
+    t0 = time.perf_counter(); parallel_tokenize(lines, patterns, range_size); parallel = time.perf_counter() - t0
+    return serial, parallel
+
+if __name__ == '__main__':
+    # python parallel_tokenizer.py [файл] — сравнение однопоточной и параллельной токенизации
+    if len(sys.argv) > 1:
+        with open(sys.argv[1], 'r', encoding='utf-8') as f: lines = f.read().split('\n')
+    else:
+        sample = ['@decorator', 'def func_{0}(self, x):', '    """Строка документации"""', "    value = x * {0} + 'text'  # комментарий", '    return value if value else None', '']
+        lines = [line.format(i) for i in range(200000) for line in sample]
+    patterns = [re.compile(p) for p in (
+        r'\b(and|as|assert|break|class|continue|def|del|elif|else|except|finally|for|from|global|if|import|in|is|lambda|nonlocal|not|or|pass|raise|return|try|while|with|yield|True|False|None|self)\b',
+        r'@[A-Za-z0-9_]+', r'"[^"\\]*(\\.[^"\\]*)*"', r"'[^'\\]*(\\.[^'\\]*)*'", r'#[^\n]*', r'\b[0-9]+\b')]
+    serial, parallel = benchmark(lines, patterns)
+    print(f"Строк: {len(lines)}, процессов: {get_pool()._max_workers}")
+    print(f"Однопоточно: {serial:.2f} c, пул процессов: {parallel:.2f} c, ускорение: x{serial / parallel:.2f}")
+    shutdown_pool()
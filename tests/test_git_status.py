@@ -0,0 +1,74 @@
+import os, shutil, subprocess
+
+import pytest
+
+pytest.importorskip("PyQt5")
+if shutil.which("git") is None: pytest.skip("git не найден", allow_module_level=True)
+
+from PyQt5.QtCore import QCoreApplication
+from git_status import GitStatusCache, norm_path
+
+
+def git(repo, *args):
+    subprocess.run(["git", "-c", "user.name=test", "-c", "user.email=test@example.com", *args], cwd=repo, check=True, capture_output=True)
+
+
+def write(repo, name, text):
+    path = os.path.join(repo, name); os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f: f.write(text)
+    return path
+
+
+@pytest.fixture
+def repo(tmp_path):
+    repo = str(tmp_path / "repo"); os.makedirs(repo)
+    git(repo, "init", "-q")
+    for name in ("src/pkg/mod.py", "old_name.py", "gone.py", "clean.py"): write(repo, name, "x = 1\n")
+    git(repo, "add", "."); git(repo, "commit", "-q", "-m", "init")
+    write(repo, "src/pkg/mod.py", "x = 2\n")                      # modified
+    write(repo, "staged.py", "y = 1\n"); git(repo, "add", "staged.py")  # added
+    git(repo, "mv", "old_name.py", "new name.py")                  # renamed (путь с пробелом)
+    os.remove(os.path.join(repo, "gone.py"))                       # deleted
+    write(repo, "fresh/deep/file.py", "z = 1\n")                   # неотслеживаемая папка
+    return repo
+
+
+@pytest.fixture
+def cache(repo):
+    app = QCoreApplication.instance() or QCoreApplication([])
+    cache = GitStatusCache(repo, delay_ms=0)
+    cache.timer.stop(); cache._start_worker(); cache.worker.wait(); app.processEvents()
+    yield cache
+    cache.shutdown()
+
+
+def test_file_states(repo, cache):
+    p = lambda name: norm_path(os.path.join(repo, name))
+    assert cache.file_states == {
+        p("src/pkg/mod.py"): "modified", p("staged.py"): "added", p("new name.py"): "renamed",
+        p("gone.py"): "deleted", p("fresh"): "untracked",
+    }
+
+
+def test_dir_states_aggregate_highest_priority(repo, cache):
+    assert cache.dir_states[norm_path(os.path.join(repo, "src/pkg"))] == "modified"
+    assert cache.dir_states[norm_path(os.path.join(repo, "src"))] == "modified"
+    assert cache.dir_states[norm_path(repo)] == "modified"
+
+
+def test_state_lookup(repo, cache):
+    path = lambda name: os.path.join(repo, name)
+    assert cache.state(path("src/pkg/mod.py")) == "modified"
+    assert cache.state(path("src"), is_dir=True) == "modified"
+    assert cache.state(path("fresh"), is_dir=True) == "untracked"
+    assert cache.state(path("fresh/deep/file.py")) == "untracked"  # по неотслеживаемому предку
+    assert cache.state(path("clean.py")) is None
+
+
+def test_incremental_refresh_and_sibling_paths(repo, cache):
+    write(repo, "clean.py", "x = 3\n")
+    cache.refresh([os.path.join(repo, "clean.py"), repo + "2" + os.sep + "x.py"])
+    assert cache.pending_paths == {norm_path(os.path.join(repo, "clean.py"))}
+    cache.timer.stop(); cache._start_worker(); cache.worker.wait(); QCoreApplication.instance().processEvents()
+    assert cache.state(os.path.join(repo, "clean.py")) == "modified"
+    assert cache.state(os.path.join(repo, "gone.py")) == "deleted"